@@ -14,25 +14,34 @@
 
 
 import asyncio
-import json
+import functools
 import logging
+import math
 import os
 import random
 import signal
+import struct
 import sys
+import threading
 import time
-from typing import Optional
+from typing import Callable, Literal, Optional
 
-import geopy.distance
-import paho.mqtt.client as mqtt
+import numpy as np
+import orjson
 import pygame
+from gmqtt import Client as MQTTClient
+from gmqtt import Subscription
 from kuksa_client.grpc import VSSClient
+from numba import njit
 from vehicle import Vehicle, vehicle
 from velocitas_sdk.vehicle_app import VehicleApp
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+MessageKind = Literal["weather", "collision"]
+Layers = list[tuple[pygame.Surface, pygame.Rect]]
+
 
 # MQTT Configuration
 BROKER_ADDRESS = "127.0.0.1"
@@ -41,29 +50,56 @@
 TOPIC_WEATHER = "alert/weather"
 TOPIC_ACCIDENT = "accident"
 
+# Compact payloads: latitude/longitude as float32, slide value/humidity as uint16
+ALERT_PAYLOAD = struct.Struct("<ff")
+WEATHER_PAYLOAD = struct.Struct("<HH")
+
 # KUKSA Configuration
 KUKSA_HOST = "127.0.0.1"
 KUKSA_PORT = 55555
 VEHICLE_ID = "Vehicle1"
 
+# Alerts arriving within this window (s) are evaluated together
+ALERT_BATCH_INTERVAL = 0.1
+
+# Mean earth radius used for the great-circle distance
+EARTH_RADIUS_KM = 6371.0088
+
 
 # Pygame Configuration
 pygame.init()
 WIDTH, HEIGHT = 1024, 600
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Head-Up Display")
+# window events after which the screen contents have to be repainted
+REDRAW_EVENTS = [
+    pygame.VIDEOEXPOSE,
+    pygame.WINDOWEXPOSED,
+    pygame.WINDOWSHOWN,
+    pygame.WINDOWRESTORED,
+]
+# only QUIT and the redraw events are handled, SDL drops everything else
+pygame.event.set_blocked(None)
+pygame.event.set_allowed([pygame.QUIT, *REDRAW_EVENTS])
 font_large = pygame.font.Font(None, 40)
 font_small = pygame.font.Font(None, 20)
-clock = pygame.time.Clock()
+FPS = 30
+# the collision readout used to grow 2 per frame under a 10 fps cap
+DISTANCE_GROWTH_PER_S = 20
 
 
-<<<<<<< HEAD
 # Base directory for assets
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
-def load_image(relative_path, size=None):
-    """Load an image from the relative path and resize if size is provided."""
+@functools.lru_cache(maxsize=None)
+def load_image(relative_path, size=None, alpha=True):
+    """Load an image from the relative path and resize if size is provided.
+
+    Full-screen backgrounds pass ``alpha=False`` so they are stored opaque.
+    ``size`` must be a tuple; results are cached, so callers share the
+    returned surface and must copy it before drawing on it.
+    """
     try:
         # Use BASE_DIR to dynamically resolve file paths
         full_path = os.path.join(BASE_DIR, relative_path)
@@ -72,49 +108,104 @@ def load_image(relative_path, size=None):
         image = pygame.image.load(full_path)
         if size:
             image = pygame.transform.scale(image, size)
-        return image
+        # match the display format once so blits don't convert every frame
+        if alpha:
+            return image.convert_alpha()
+        return image.convert()
     except Exception as e:
         logger.error(f"Failed to load image {relative_path}: {e}")
         sys.exit(1)
 
 
 # Update image paths
-background_image = load_image("app/src/Hit&Run Case.png", (WIDTH, HEIGHT))
-weather_background_image = load_image("app/src/Weather Alert Case.png", (WIDTH, HEIGHT))
-warning_icon = load_image("app/src/alert_msg.png", (240, 175))
-warning_speed_icon = load_image("app/src/alert_speed.png", (280, 270))
-warning_road_icon = load_image("app/src/alert_road.png", (328, 99))
-two_car_icon = load_image("app/src/signal.png", (64, 64))
-weather_speed_icon = load_image("app/src/weather_speed.png", (222, 215))
-alert_weather_icon = load_image("app/src/alert_weather.png", (325, 279))
-=======
-# alert image
-background_image = pygame.image.load("./src/Hit&Run Case.png")
-background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))
-
-weather_background_image = pygame.image.load("./src/Weather Alert Case.png")
-weather_background_image = pygame.transform.scale(
-    weather_background_image, (WIDTH, HEIGHT)
-)
-
-warning_icon = pygame.image.load("./src/alert_msg.png")
-warning_icon = pygame.transform.scale(warning_icon, (240, 175))
-
-warning_speed_icon = pygame.image.load("./src/alert_speed.png")
-warning_speed_icon = pygame.transform.scale(warning_speed_icon, (280, 270))
-
-warning_road_icon = pygame.image.load("./src/alert_road.png")
-warning_road_icon = pygame.transform.scale(warning_road_icon, (328, 99))
-
-two_car_icon = pygame.image.load("./src/signal.png")
-two_car_icon = pygame.transform.scale(two_car_icon, (64, 64))
-
-weather_speed_icon = pygame.image.load("./src/weather_speed.png")
-weather_speed_icon = pygame.transform.scale(weather_speed_icon, (278 * 0.8, 269 * 0.8))
-
-alert_weather_icon = pygame.image.load("./src/alert_weather.png")
-alert_weather_icon = pygame.transform.scale(alert_weather_icon, (325, 279))
->>>>>>> 01220d3ebab30834b7fdac5d6fda56d677486e10
+background_image = load_image("Hit&Run Case.png", (WIDTH, HEIGHT), False)
+weather_background_image = load_image("Weather Alert Case.png", (WIDTH, HEIGHT), False)
+warning_icon = load_image("alert_msg.png", (240, 175))
+warning_speed_icon = load_image("alert_speed.png", (280, 270))
+warning_road_icon = load_image("alert_road.png", (328, 99))
+two_car_icon = load_image("signal.png", (64, 64))
+weather_speed_icon = load_image("weather_speed.png", (222, 215))
+alert_weather_icon = load_image("alert_weather.png", (325, 279))
+
+# icon and text placement, resolved once so a frame only touches these areas
+POS_WEATHER_SPEED = (WIDTH // 2 - 330, HEIGHT // 2 - 90)
+POS_ALERT_WEATHER = (WIDTH // 2 - 125, HEIGHT // 2 - 120)
+POS_TWO_CAR = (WIDTH // 2 - 350, HEIGHT // 2 - 80)
+POS_WARNING_SPEED = (WIDTH // 2 - 330, HEIGHT // 2 - 90)
+POS_WARNING = (WIDTH // 2, HEIGHT // 2 - 120)
+POS_WARNING_ROAD = (WIDTH // 2 + 10, HEIGHT // 2 + 40)
+POS_TEXT = (WIDTH // 2 + 120, HEIGHT // 2 - 50)
+
+weather_speed_rect = weather_speed_icon.get_rect(topleft=POS_WEATHER_SPEED)
+alert_weather_rect = alert_weather_icon.get_rect(topleft=POS_ALERT_WEATHER)
+two_car_rect = two_car_icon.get_rect(topleft=POS_TWO_CAR)
+warning_speed_rect = warning_speed_icon.get_rect(topleft=POS_WARNING_SPEED)
+warning_rect = warning_icon.get_rect(topleft=POS_WARNING)
+warning_road_rect = warning_road_icon.get_rect(topleft=POS_WARNING_ROAD)
+
+
+def merge_rects(rects):
+    """Coalesce overlapping rects so the display update gets a short list."""
+    merged: list[pygame.Rect] = []
+    for rect in rects:
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+@functools.lru_cache(maxsize=256)
+def render_red(text):
+    """Render HUD text in red, reusing the surface for a repeated string."""
+    return font_large.render(text, True, (255, 0, 0))
+
+
+# explicit signatures compile at import, so the first alert never waits on the JIT
+@njit("f8(f8, f8, f8, f8)", fastmath=True)
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two points given in degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+@njit("f8[:](f8[:], f8[:], f8, f8)", fastmath=True)
+def haversine_vector_km(lats, lons, lat0, lon0):
+    """Great-circle distances in km from one point to arrays of points."""
+    phi = np.radians(lats)
+    phi0 = math.radians(lat0)
+    dphi = phi - phi0
+    dlambda = np.radians(lons - lon0)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi0) * np.cos(phi) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def decode_alert(payload):
+    """Return the collision location carried by an alert payload.
+
+    Publishers that have not moved to the packed format still send JSON.
+    """
+    if len(payload) == ALERT_PAYLOAD.size:
+        latitude, longitude = ALERT_PAYLOAD.unpack(payload)
+        return {"latitude": latitude, "longitude": longitude}
+    return orjson.loads(payload)["collision_location"]
+
+
+def decode_weather(payload):
+    """Return ``(slide_value, humidity)`` from a weather payload."""
+    if len(payload) == WEATHER_PAYLOAD.size:
+        return WEATHER_PAYLOAD.unpack(payload)
+    data = orjson.loads(payload)
+    return data.get("slide_value", 0), data.get("humidity", 0)
 
 
 # class definition
@@ -123,12 +214,10 @@ def __init__(self, vehicle_client: Vehicle):
         super().__init__()
         self.Vehicle = vehicle_client
 
-        # generate mqtt client
-        self.mqtt_client = mqtt.Client()
+        # generate mqtt client, connected from run() on the asyncio loop
+        self.mqtt_client = MQTTClient(f"{VEHICLE_ID}-hud")
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
-        self.mqtt_client.connect(BROKER_ADDRESS, PORT)
-        self.mqtt_client.loop_start()
 
         # generate kuksa client
         self.kuksa_client = VSSClient(KUKSA_HOST, KUKSA_PORT)
@@ -136,6 +225,7 @@ def __init__(self, vehicle_client: Vehicle):
 
         # Variables
         self.message_to_display: Optional[str] = None
+        self.message_kind: Optional[MessageKind] = None
         self.slide_value = 0
         self.humidity = 0
         self.slide_cnt = 0
@@ -143,54 +233,121 @@ def __init__(self, vehicle_client: Vehicle):
         self.message_display_time: Optional[float] = None
         self.current_speed = random.randrange(66, 75)
         self.this_location = {"latitude": 50, "longitude": 9}
-        self.accdient_distance = 0
+        self.accdient_distance = 0.0
+        self._alert_t0 = 0.0
+        self._alert_d0 = 0.0
+        self._last_dist_key: Optional[tuple[float, float, float, float]] = None
+        self._alert_queue: list[tuple[float, float]] = []
+        self._alert_drain: Optional[asyncio.TimerHandle] = None
+
+        # Static HUD layouts, composited once so a frame is a single blit
+        self.weather_hud = weather_background_image.copy()
+        self.weather_hud.blit(weather_speed_icon, weather_speed_rect)
+        self.weather_hud.blit(alert_weather_icon, alert_weather_rect)
+        self.weather_hud.blit(two_car_icon, two_car_rect)
+        self.collision_hud_far = background_image.copy()
+        self.collision_hud_far.blit(warning_icon, warning_rect)
+        self.collision_hud_far.blit(warning_road_icon, warning_road_rect)
+        self.collision_hud_near = background_image.copy()
+        self.collision_hud_near.blit(warning_speed_icon, warning_speed_rect)
+        self.collision_hud_near.blit(warning_icon, warning_rect)
+        self.collision_hud_near.blit(warning_road_icon, warning_road_rect)
+
+        # Rendering state
+        self._presented_idle = False
+        self._current_background: Optional[pygame.Surface] = None
+        self._drawn_layers: Layers = []
+        self._render_fns: dict[
+            MessageKind, Callable[[], tuple[pygame.Surface, Layers]]
+        ] = {
+            "weather": self._render_weather,
+            "collision": self._render_collision,
+        }
 
     async def on_stop(self):
         logger.info("Stopping MQTT and KUKSA Clients...")
-        self.mqtt_client.loop_stop()
-        self.mqtt_client.disconnect()
+        if self._alert_drain is not None:
+            self._alert_drain.cancel()
+        await self.mqtt_client.disconnect()
         self.kuksa_client.close()
 
-    def on_connect(self, client, userdata, flags, reason_code, properties=None):
+    def on_connect(self, client, flags, reason_code, properties):
         if reason_code == 0:
             logger.info("Connected to MQTT Broker successfully.")
-            client.subscribe([(TOPIC_ALERT, 0), (TOPIC_WEATHER, 0)])
+            client.subscribe(
+                [Subscription(TOPIC_ALERT, qos=0), Subscription(TOPIC_WEATHER, qos=0)]
+            )
         else:
             logger.error(f"Failed to connect to MQTT Broker: {reason_code}")
 
-    def on_message(self, client, userdata, message):
+    def on_message(self, client, topic, payload, qos, properties):
+        # gmqtt calls this on the asyncio loop, so no thread hand-off is needed
         try:
-            decoded_message = message.payload.decode("utf-8")
-            data = json.loads(decoded_message)
-
-            if message.topic == TOPIC_WEATHER:
-                self.slide_value = data.get("slide_value", 0)
-                self.humidity = data.get("humidity", 0)
+            if topic == TOPIC_WEATHER:
+                self.slide_value, self.humidity = decode_weather(payload)
                 if self.slide_value >= 500:
                     self.slide_cnt += 1
                 self.message_to_display = f"Slide Count: {self.slide_cnt}"
-                logger.info(f"Weather Data Received: {data}")
-            elif message.topic == TOPIC_ALERT:
-                self.collision_location = data.get("collision_location")
-                logger.info(self.collision_location)
-                self.accdient_distance = geopy.distance.distance(
-                    (
-                        self.collision_location["latitude"],
-                        self.collision_location["longitude"],
-                    ),
-                    (self.this_location["latitude"], self.this_location["longitude"]),
-                ).km
-
-                self.message_to_display = f"{round(self.accdient_distance, 1)} M"
-
-                logger.info(f"Collision Data Received: {data}")
-                logger.info(f"{self.message_to_display}")
-
-            self.message_display_time = time.time()
+                self.message_kind = "weather"
+                self.message_display_time = time.time()
+                logger.info(
+                    f"Weather Data Received: slide_value={self.slide_value}, "
+                    f"humidity={self.humidity}"
+                )
+            elif topic == TOPIC_ALERT:
+                location = decode_alert(payload)
+                logger.info(f"Collision Data Received: {location}")
+                latitude = float(location["latitude"])
+                longitude = float(location["longitude"])
+                if not (math.isfinite(latitude) and math.isfinite(longitude)):
+                    raise ValueError(f"Invalid collision location: {location}")
+                if self._alert_drain is None:
+                    # the first alert of a batch schedules the drain
+                    self._alert_drain = asyncio.get_running_loop().call_later(
+                        ALERT_BATCH_INTERVAL, self._drain_alerts
+                    )
+                self._alert_queue.append((latitude, longitude))
         except Exception as e:
             logger.error(f"Error processing message: {e}")
+        return 0
 
-    async def monitor_kuksa(self):
+    def _drain_alerts(self):
+        self._alert_drain = None
+        alerts, self._alert_queue = self._alert_queue, []
+        try:
+            self._apply_alerts(alerts)
+        except Exception as e:
+            logger.error(f"Error processing alerts: {e}")
+
+    def _apply_alerts(self, alerts):
+        # ~1 m resolution; unchanged endpoints reuse the last distance
+        lat0 = round(self.this_location["latitude"], 5)
+        lon0 = round(self.this_location["longitude"], 5)
+        if len(alerts) == 1:
+            latitude, longitude = round(alerts[0][0], 5), round(alerts[0][1], 5)
+            dist_key = (latitude, longitude, lat0, lon0)
+            if dist_key != self._last_dist_key:
+                self.accdient_distance = haversine_km(*dist_key)
+        else:
+            # a burst of candidates is evaluated in one pass and the nearest wins
+            coords = np.round(np.array(alerts, dtype=np.float64), 5)
+            distances = haversine_vector_km(coords[:, 0], coords[:, 1], lat0, lon0)
+            nearest = int(np.argmin(distances))
+            latitude, longitude = coords[nearest].tolist()
+            dist_key = (latitude, longitude, lat0, lon0)
+            self.accdient_distance = float(distances[nearest])
+        self._last_dist_key = dist_key
+        self.collision_location = {"latitude": latitude, "longitude": longitude}
+
+        self._alert_t0 = time.time()
+        self._alert_d0 = self.accdient_distance
+        self.message_to_display = f"{round(self.accdient_distance, 1)} M"
+        self.message_kind = "collision"
+        self.message_display_time = self._alert_t0
+        logger.info(f"{self.message_to_display}")
+
+    def _kuksa_worker(self, loop):
+        # the subscription is a blocking generator, so it lives on its own thread
         try:
             # get gps mock data here
             logger.info("Subscribing to KUKSA data...")
@@ -200,51 +357,98 @@ async def monitor_kuksa(self):
                     "Vehicle.CurrentLocation.Longitude",
                 ]
             ):
-                self.this_location["latitude"] = update.get(
-                    "Vehicle.CurrentLocation.Latitude"
-                ).value
-                self.this_location["longitude"] = update.get(
-                    "Vehicle.CurrentLocation.Longitude"
-                ).value
+                loop.call_soon_threadsafe(self._apply_location, update)
         except Exception as e:
             logger.error(f"KUKSA monitoring failed: {e}")
 
+    def _apply_location(self, update):
+        self.this_location["latitude"] = update.get(
+            "Vehicle.CurrentLocation.Latitude"
+        ).value
+        self.this_location["longitude"] = update.get(
+            "Vehicle.CurrentLocation.Longitude"
+        ).value
+
     async def run(self):
-        asyncio.create_task(self.monitor_kuksa())
+        await self.mqtt_client.connect(BROKER_ADDRESS, PORT)
+        threading.Thread(
+            target=self._kuksa_worker,
+            args=(asyncio.get_running_loop(),),
+            name="kuksa-monitor",
+            daemon=True,
+        ).start()
+        target_dt = 1 / FPS
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+            frame_start = time.perf_counter()
+            if pygame.event.peek(pygame.QUIT):
+                pygame.quit()
+                sys.exit()
+            if pygame.event.get(REDRAW_EVENTS):
+                # the window was covered or restored, so repaint it in full
+                self._presented_idle = False
+                self._current_background = None
 
             if self.message_to_display:
-                self.display_message(self.message_to_display)
-                if time.time() - self.message_display_time > 5:
+                self.display_message()
+                if (
+                    self.message_display_time is not None
+                    and time.time() - self.message_display_time > 5
+                ):
                     self.message_to_display = None
-            else:
+            elif not self._presented_idle:
+                # the idle screen is static, so it is presented once per idle period
                 screen.blit(background_image, (0, 0))
                 pygame.display.flip()
-            clock.tick(10)
-            await asyncio.sleep(0.03)
+                self._current_background = background_image
+                self._drawn_layers = []
+                self._presented_idle = True
 
-    def display_message(self, text):
+            # single throttle point, so the event loop stays free between frames
+            frame_end = time.perf_counter()
+            await asyncio.sleep(max(0.0, target_dt - (frame_end - frame_start)))
+
+    def display_message(self):
         # hud display describe
-        if "Slide Count" in text:
-            screen.blit(weather_background_image, (0, 0))
-            screen.blit(weather_speed_icon, (WIDTH // 2 - 330, HEIGHT // 2 - 90))
-            screen.blit(alert_weather_icon, (WIDTH // 2 - 125, HEIGHT // 2 - 120))
-            screen.blit(two_car_icon, (WIDTH // 2 - 350, HEIGHT // 2 - 80))
+        if self.message_kind is None:
+            return
+        background, layers = self._render_fns[self.message_kind]()
+        if background is self._current_background and layers == self._drawn_layers:
+            # nothing visible changed since the last frame
+            return
+        rects = [rect for _, rect in layers]
+
+        if background is not self._current_background:
+            # switching layouts, so the whole screen has to be repainted once
+            screen.blit(background, (0, 0))
+            for surface, rect in layers:
+                screen.blit(surface, rect)
+            pygame.display.flip()
+        else:
+            # erase what was drawn last frame and repaint only those areas
+            dirty = merge_rects([rect for _, rect in self._drawn_layers] + rects)
+            for rect in dirty:
+                screen.blit(background, rect, area=rect)
+            for surface, rect in layers:
+                screen.blit(surface, rect)
+            pygame.display.update(dirty)
+
+        self._current_background = background
+        self._drawn_layers = layers
+        self._presented_idle = False
+
+    def _render_weather(self):
+        return self.weather_hud, []
+
+    def _render_collision(self):
+        elapsed = time.time() - self._alert_t0
+        text = f"{round(self._alert_d0 + DISTANCE_GROWTH_PER_S * elapsed, 1)} M"
+        if self.collision_location["latitude"] < 52:
+            background = self.collision_hud_near
         else:
-            screen.blit(background_image, (0, 0))
-            self.accdient_distance += 2
-            text = f"{round(self.accdient_distance, 1)} M"
-            if self.collision_location["latitude"] < 52:
-                screen.blit(warning_speed_icon, (WIDTH // 2 - 330, HEIGHT // 2 - 90))
-            screen.blit(warning_icon, (WIDTH // 2, HEIGHT // 2 - 120))
-            screen.blit(warning_road_icon, (WIDTH // 2 + 10, HEIGHT // 2 + 40))
-            message_surface = font_large.render(text, True, (255, 0, 0))
-            screen.blit(message_surface, (WIDTH // 2 + 120, HEIGHT // 2 - 50))
-        pygame.display.flip()
+            background = self.collision_hud_far
+        message_surface = render_red(text)
+        message_rect = message_surface.get_rect(topleft=POS_TEXT)
+        return background, [(message_surface, message_rect)]
 
 
 async def main():
@@ -0,0 +1,345 @@
+# Copyright (c) 2022-2024 Contributors to the Eclipse Foundation
+#
+# This program and the accompanying materials are made available under the
+# terms of the Apache License, Version 2.0 which is available at
+# https://www.apache.org/licenses/LICENSE-2.0.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+# skip B101
+
+import asyncio
+from unittest import mock
+
+import numpy as np
+import orjson
+import pygame
+import pytest
+
+import main
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # the MQTT and KUKSA clients are replaced, nothing connects anywhere
+    monkeypatch.setattr(main, "MQTTClient", mock.MagicMock())
+    monkeypatch.setattr(main, "VSSClient", mock.MagicMock())
+    return main.CustomVehicleApp(main.vehicle)
+
+
+@pytest.fixture
+def display(monkeypatch):
+    flip = mock.Mock()
+    update = mock.Mock()
+    monkeypatch.setattr(main.pygame.display, "flip", flip)
+    monkeypatch.setattr(main.pygame.display, "update", update)
+    return flip, update
+
+
+def show_collision(app, distance, latitude=50.0):
+    app.collision_location = {"latitude": latitude, "longitude": 9.0}
+    app._alert_t0 = main.time.time()
+    app._alert_d0 = distance
+    app.message_kind = "collision"
+
+
+def test_merge_rects():
+    a = pygame.Rect(0, 0, 10, 10)
+    b = pygame.Rect(5, 5, 10, 10)
+    c = pygame.Rect(12, 12, 10, 10)
+    far = pygame.Rect(100, 100, 5, 5)
+
+    merged = main.merge_rects([a, far, c, b])
+
+    assert sorted(merged) == [pygame.Rect(0, 0, 22, 22), far]
+    # inputs are left untouched
+    assert a == pygame.Rect(0, 0, 10, 10)
+
+
+def test_display_message_flips_once_then_updates_dirty_rects(app, display):
+    flip, update = display
+
+    show_collision(app, 10.0)
+    app.display_message()
+    assert flip.call_count == 1
+    update.assert_not_called()
+    first_rect = app._drawn_layers[0][1]
+
+    show_collision(app, 1234.5)
+    app.display_message()
+    assert flip.call_count == 1
+    update.assert_called_once()
+    (dirty,) = update.call_args.args
+    text_rect = app._drawn_layers[0][1]
+    # both the old and the new text area are repainted, nothing else
+    assert all(r.contains(first_rect) or r.contains(text_rect) for r in dirty)
+    assert dirty[0].unionall(dirty[1:]) == first_rect.union(text_rect)
+
+
+def test_render_picks_prebuilt_layout(app):
+    app.message_kind = "weather"
+    assert app._render_weather() == (app.weather_hud, [])
+
+    show_collision(app, 10.0, latitude=50.0)
+    near, layers = app._render_collision()
+    assert near is app.collision_hud_near
+    assert len(layers) == 1
+
+    show_collision(app, 10.0, latitude=53.0)
+    far, _ = app._render_collision()
+    assert far is app.collision_hud_far
+
+    # the composites are copies, the shared backgrounds stay untouched
+    assert app.collision_hud_near is not main.background_image
+    assert app.weather_hud is not main.weather_background_image
+
+
+def test_haversine_km():
+    # one degree along a meridian
+    assert main.haversine_km(50.0, 9.0, 51.0, 9.0) == pytest.approx(111.195, abs=1e-3)
+    # Paris to London
+    assert main.haversine_km(48.8566, 2.3522, 51.5074, -0.1278) == pytest.approx(
+        343.6, abs=0.5
+    )
+    assert main.haversine_km(50.0, 9.0, 50.0, 9.0) == 0.0
+
+
+def test_on_connect_subscribes_to_alert_topics(app):
+    client = mock.Mock()
+    app.on_connect(client, 0, 0, None)
+    (subscriptions,) = client.subscribe.call_args.args
+    assert {s.topic for s in subscriptions} == {main.TOPIC_ALERT, main.TOPIC_WEATHER}
+
+
+@pytest.mark.asyncio
+async def test_on_message_weather(app):
+    payload = orjson.dumps({"slide_value": 600, "humidity": 80})
+    assert app.on_message(None, main.TOPIC_WEATHER, payload, 0, None) == 0
+    assert (app.slide_value, app.humidity, app.slide_cnt) == (600, 80, 1)
+    assert app.message_kind == "weather"
+    assert app.message_to_display == "Slide Count: 1"
+
+
+@pytest.mark.asyncio
+async def test_on_message_queues_alert(app):
+    location = {"latitude": 50, "longitude": 9}
+    payload = orjson.dumps({"collision_location": location})
+    assert app.on_message(None, main.TOPIC_ALERT, payload, 0, None) == 0
+    assert app._alert_queue == [(50.0, 9.0)]
+    assert all(isinstance(v, float) for v in app._alert_queue[0])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "topic, payload",
+    [
+        # 9 bytes, so it is not mistaken for a packed alert
+        (main.TOPIC_ALERT, b"not json!"),
+        (main.TOPIC_ALERT, b'{"collision_location": {"latitude": null}}'),
+        (
+            main.TOPIC_ALERT,
+            b'{"collision_location": {"latitude": "x", "longitude": 9}}',
+        ),
+        (
+            main.TOPIC_ALERT,
+            b'{"collision_location": {"latitude": NaN, "longitude": 9}}',
+        ),
+        (main.TOPIC_WEATHER, b"{"),
+    ],
+)
+async def test_on_message_rejects_bad_payloads(app, topic, payload):
+    assert app.on_message(None, topic, payload, 0, None) == 0
+    assert app._alert_queue == []
+    assert app.message_to_display is None
+
+
+def test_decode_alert_packed():
+    payload = main.ALERT_PAYLOAD.pack(50.5, 9.25)
+    assert len(payload) == 8
+    assert main.decode_alert(payload) == {"latitude": 50.5, "longitude": 9.25}
+
+
+def test_decode_alert_json():
+    location = {"latitude": 50.123456, "longitude": 9.654321}
+    payload = orjson.dumps({"collision_location": location})
+    assert main.decode_alert(payload) == location
+
+
+def test_decode_weather_packed():
+    payload = main.WEATHER_PAYLOAD.pack(600, 80)
+    assert len(payload) == 4
+    assert main.decode_weather(payload) == (600, 80)
+
+
+def test_decode_weather_json():
+    payload = orjson.dumps({"slide_value": 600, "humidity": 80})
+    assert main.decode_weather(payload) == (600, 80)
+    assert main.decode_weather(b"{}") == (0, 0)
+
+
+def test_collision_readout_grows_with_elapsed_time(app, monkeypatch):
+    show_collision(app, 10.0)
+    monkeypatch.setattr(main.time, "time", lambda: app._alert_t0 + 0.5)
+    _, [(surface, _)] = app._render_collision()
+    assert surface is main.render_red("20.0 M")
+
+
+def test_display_message_skips_unchanged_frames(app, display, monkeypatch):
+    flip, update = display
+    show_collision(app, 10.0)
+    monkeypatch.setattr(main.time, "time", lambda: app._alert_t0)
+
+    app.display_message()
+    app.display_message()
+    assert flip.call_count == 1
+    update.assert_not_called()
+
+
+def test_apply_alerts_skips_unchanged_positions(app, monkeypatch):
+    app.this_location = {"latitude": 50.0, "longitude": 9.0}
+    app._apply_alerts([(50.1, 9.0)])
+    distance = app.accdient_distance
+
+    calls = []
+
+    def fake_haversine_km(*args):
+        calls.append(args)
+        return 1.0
+
+    monkeypatch.setattr(main, "haversine_km", fake_haversine_km)
+
+    # below the ~1 m key resolution, so the last distance is reused
+    app._apply_alerts([(50.100001, 9.000001)])
+    assert calls == []
+    assert app.accdient_distance == distance
+
+    app.this_location["latitude"] = 50.05
+    app._apply_alerts([(50.1, 9.0)])
+    assert len(calls) == 1
+    assert app.accdient_distance == 1.0
+
+
+def alert_payload(latitude, longitude):
+    return orjson.dumps(
+        {"collision_location": {"latitude": latitude, "longitude": longitude}}
+    )
+
+
+def test_apply_alerts_picks_nearest_of_burst(app):
+    app.this_location = {"latitude": 50.0, "longitude": 9.0}
+
+    app._apply_alerts([(51.0, 9.0), (50.1, 9.0), (52.0, 9.0)])
+
+    assert app.collision_location == {"latitude": 50.1, "longitude": 9.0}
+    assert app.accdient_distance == pytest.approx(
+        main.haversine_km(50.1, 9.0, 50.0, 9.0)
+    )
+    assert app.message_kind == "collision"
+
+
+@pytest.mark.asyncio
+async def test_alert_burst_is_drained_once(app, monkeypatch):
+    monkeypatch.setattr(main, "ALERT_BATCH_INTERVAL", 0.01)
+    app.this_location = {"latitude": 50.0, "longitude": 9.0}
+    # nothing is scheduled while no alerts arrive
+    assert app._alert_drain is None
+
+    for latitude in (51.0, 50.1, 52.0):
+        app.on_message(None, main.TOPIC_ALERT, alert_payload(latitude, 9.0), 0, None)
+    assert app._alert_drain is not None
+    assert len(app._alert_queue) == 3
+
+    await asyncio.sleep(0.05)
+    assert app._alert_drain is None
+    assert app._alert_queue == []
+    assert app.collision_location == {"latitude": 50.1, "longitude": 9.0}
+
+
+@pytest.mark.asyncio
+async def test_failing_alert_batch_does_not_stop_later_ones(app, monkeypatch):
+    monkeypatch.setattr(main, "ALERT_BATCH_INTERVAL", 0.01)
+    app.this_location = {"latitude": 50.0, "longitude": 9.0}
+    apply_alerts = app._apply_alerts
+    monkeypatch.setattr(app, "_apply_alerts", mock.Mock(side_effect=RuntimeError))
+
+    app.on_message(None, main.TOPIC_ALERT, alert_payload(51.0, 9.0), 0, None)
+    await asyncio.sleep(0.05)
+    assert app._alert_queue == []
+
+    monkeypatch.setattr(app, "_apply_alerts", apply_alerts)
+    app.on_message(None, main.TOPIC_ALERT, alert_payload(50.1, 9.0), 0, None)
+    await asyncio.sleep(0.05)
+    assert app.collision_location == {"latitude": 50.1, "longitude": 9.0}
+
+
+def test_haversine_is_compiled_and_matches_python():
+    # both helpers are compiled eagerly from their explicit signatures
+    assert main.haversine_km.signatures
+    assert main.haversine_vector_km.signatures
+
+    args = (48.8566, 2.3522, 51.5074, -0.1278)
+    assert main.haversine_km(*args) == pytest.approx(main.haversine_km.py_func(*args))
+
+    lats = np.array([50.0, 50.1, 51.0])
+    lons = np.array([9.0, 9.0, 9.5])
+    np.testing.assert_allclose(
+        main.haversine_vector_km(lats, lons, 50.0, 9.0),
+        main.haversine_vector_km.py_func(lats, lons, 50.0, 9.0),
+    )
+
+
+def test_apply_alerts_accepts_integer_burst(app):
+    app.this_location = {"latitude": 50, "longitude": 9}
+    app._apply_alerts([(51, 9), (52, 9)])
+    assert app.collision_location == {"latitude": 51.0, "longitude": 9.0}
+    assert app.accdient_distance == pytest.approx(111.195, abs=1e-3)
+
+
+async def run_frames(app, frames):
+    task = asyncio.create_task(app.run())
+    await asyncio.sleep(frames / main.FPS)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_idle_screen_is_presented_once(app, display):
+    flip, update = display
+    app.mqtt_client.connect = mock.AsyncMock()
+    app.kuksa_client.subscribe_current_values.return_value = iter([])
+
+    await run_frames(app, 5)
+    assert flip.call_count == 1
+    update.assert_not_called()
+
+    # a newly exposed window is repainted once, then the loop is idle again
+    pygame.event.post(pygame.event.Event(pygame.WINDOWEXPOSED))
+    await run_frames(app, 5)
+    assert flip.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expose_forces_full_repaint_of_message(app, display, monkeypatch):
+    flip, update = display
+    app.mqtt_client.connect = mock.AsyncMock()
+    app.kuksa_client.subscribe_current_values.return_value = iter([])
+    show_collision(app, 10.0)
+    app.message_to_display = "10.0 M"
+    app.message_display_time = main.time.time()
+    monkeypatch.setattr(main.time, "time", lambda: app._alert_t0)
+
+    await run_frames(app, 5)
+    assert flip.call_count == 1
+
+    pygame.event.post(pygame.event.Event(pygame.VIDEOEXPOSE))
+    await run_frames(app, 5)
+    assert flip.call_count == 2
+    update.assert_not_called()